@@ -6,12 +6,15 @@ def add_routes(config):
     config.add_route('form_item', '/form_item')
     config.add_route('home', '/')
     config.add_route('item', '/item')
+    config.add_route('item_batch', '/item_batch')
     config.add_route('item_item', '/item/{item_id}')
 
 
 def main():
     """Build and return the Pyramid WSGI application."""
     config = Configurator()
+    config.include('pyramid_addons')
+    config.include('pyramid_chameleon')
     add_routes(config)
     config.scan()
     return config.make_wsgi_app()
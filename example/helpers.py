@@ -1,22 +1,65 @@
+from functools import wraps
 from pyramid.httpexceptions import HTTPNotFound
+from pyramid.renderers import get_renderer
 from pyramid_addons.validation import SOURCE_MATCHDICT, Validator
 
 
+def site_layout(layout_template):
+    """Provide the layout macro and route_url helper to a view's template.
+
+    The `layout` macro of `layout_template` is made available as `_LAYOUT` and
+    `request.route_url` as `_R`.
+
+    """
+    def initial_wrap(function):
+        @wraps(function)
+        def wrapped(request, *args, **kwargs):
+            info = function(request, *args, **kwargs)
+            if isinstance(info, dict):
+                renderer = get_renderer(layout_template)
+                info['_LAYOUT'] = renderer.implementation().macros['layout']
+                info['_R'] = request.route_url
+            return info
+        return wrapped
+    return initial_wrap
+
+
 class DBThing(Validator):
 
     """An application-specific validator that converts ids into the object."""
 
-    def __init__(self, param, cls, id_validator, **kwargs):
+    def __init__(self, param, cls, id_validator, cache=None, **kwargs):
+        """Create a DBThing instance.
+
+        :param cache: An optional cache, such as a
+            `pyramid_addons.cache.SharedCache`, used to avoid fetching the same
+            object repeatedly.
+
+        """
         super(DBThing, self).__init__(param, **kwargs)
         self.cls = cls
         self.id_validator = id_validator
+        self.cache = cache
+
+    def fetch(self, item_id):
+        """Return the object with id `item_id` or None."""
+        if self.cache is None:
+            return self.cls.fetch_by_id(item_id)
+        key = '{0}:{1}'.format(self.cls.__name__, item_id)
+        thing = self.cache.get(key)
+        if thing is None:
+            thing = self.cls.fetch_by_id(item_id)
+            if thing is not None:
+                self.cache.set(key, thing)
+        return thing
 
     def run(self, value, errors, request):
         """Return the object if valid and available, otherwise None."""
         item_id = self.id_validator(value, errors, request)
         thing = None
         if not errors:  # the id passed validation
-            thing = self.cls.fetch_by_id(item_id)
+            self.check_deadline(request)
+            thing = self.fetch(item_id)
         if not thing and self.source == SOURCE_MATCHDICT:
             # If the id is part of the URL we should raise a not-found error.
             raise HTTPNotFound()
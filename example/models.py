@@ -1,26 +1,37 @@
+import threading
+
+
 class Item(object):
 
     """A simple class that mimics some behavior of a database backed class.
 
-    Note that this class is _NOT_ thread safe. It is just for demonstration
-    purposes.
+    The item store is thread safe, however, it is local to each process. When
+    run with multiple worker processes each worker has its own set of items.
 
     """
 
     items = {}
+    lock = threading.Lock()
     max_id = 0
 
+    @classmethod
+    def all(cls):
+        """Return a list of all the items."""
+        with cls.lock:
+            return list(cls.items.values())
+
     @classmethod
     def fetch_by_id(cls, item_id):
         """Return the item at id `item_id` or None."""
         return cls.items.get(item_id, None)
 
     def __init__(self, name, value):
-        self.id = Item.max_id
         self.name = name
         self.value = value
-        Item.items[self.id] = self
-        Item.max_id += 1
+        with Item.lock:
+            self.id = Item.max_id
+            Item.max_id += 1
+            Item.items[self.id] = self
 
 
 # Prepopulate with some data since it's volatile
@@ -1,16 +1,22 @@
-from .helpers import DBThing
+from .helpers import DBThing, site_layout
 from .models import Item
 from pyramid.view import view_config
-from pyramid_addons.helpers import http_created, site_layout
+from pyramid_addons.helpers import http_created
 from pyramid_addons.validation import (SOURCE_MATCHDICT, String, TextNumber,
-                                       validate)
+                                       validate, validate_batch)
+
+
+def create_item(request, name, value):
+    item = Item(name, value)
+    url = request.route_url('item_item', item_id=item.id)
+    return http_created(request, redir_location=url)
 
 
 @view_config(route_name='home', renderer='templates/home.pt',
              request_method='GET')
 @site_layout('example:templates/layout.pt')
 def home(request):
-    return {'page_title': 'Home', 'items': Item.items.values()}
+    return {'page_title': 'Home', 'items': Item.all()}
 
 
 @view_config(route_name='item', renderer='json', request_method='PUT')
@@ -18,9 +24,17 @@ def home(request):
           value=String('value', min_length=5, max_length=128, optional=True,
                        default='...No value specified...'))
 def item_create(request, name, value):
-    item = Item(name, value)
-    url = request.route_url('item_item', item_id=item.id)
-    return http_created(request, redir_location=url)
+    return create_item(request, name, value)
+
+
+@view_config(route_name='item_batch', renderer='json', request_method='PUT')
+@validate_batch(max_operations=500,
+                name=String('name', min_length=1, max_length=10),
+                value=String('value', min_length=5, max_length=128,
+                             optional=True,
+                             default='...No value specified...'))
+def item_create_batch(request, name, value):
+    return create_item(request, name, value)
 
 
 @view_config(route_name='item_item', renderer='templates/item.pt',
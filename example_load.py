@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""Generate concurrent load against the example application.
+
+Start the example web application with `run_example.py` and then run this
+script to exercise the `/item` (PUT) and `/item/{item_id}` (GET) routes.
+
+"""
+from __future__ import division, print_function
+import json
+import random
+import requests
+import sys
+import threading
+import time
+from optparse import OptionParser
+
+BASE_URL = 'http://127.0.0.1:8080'
+
+
+def build_payload(valid, size):
+    """Return a json-encoded item whose `value` is roughly `size` characters.
+
+    When `valid` is False the `name` parameter is made too long so that the
+    request fails validation.
+
+    """
+    name = 'item' if valid else 'x' * 32
+    value = 'v' * (max(5, min(size, 128)) if valid else size)
+    return json.dumps({'name': name, 'value': value})
+
+
+def percentile(ordered, fraction):
+    """Return the value at `fraction` of the sorted list `ordered`."""
+    if not ordered:
+        return 0
+    index = int(round(fraction * (len(ordered) - 1)))
+    return ordered[index]
+
+
+class Worker(threading.Thread):
+
+    """A thread that issues requests until its quota is consumed."""
+
+    def __init__(self, options, count):
+        super(Worker, self).__init__()
+        self.daemon = True
+        self.options = options
+        self.count = count
+        self.random = random.Random()
+        self.results = []  # (kind, status, seconds)
+        self.session = requests.Session()
+
+    def run(self):
+        for _ in range(self.count):
+            if self.random.random() < self.options.get_ratio:
+                kind, url = 'get', '{0}/item/{1}'.format(
+                    self.options.url,
+                    self.random.randint(0, self.options.max_item_id))
+                args = {}
+            else:
+                valid = self.random.random() >= self.options.invalid_ratio
+                kind = 'put' if valid else 'put_invalid'
+                url = '{0}/item'.format(self.options.url)
+                args = {'data': build_payload(valid, self.options.size)}
+            start = time.time()
+            try:
+                method = 'GET' if kind == 'get' else 'PUT'
+                status = self.session.request(method, url, **args).status_code
+            except requests.RequestException:
+                status = None
+            self.results.append((kind, status, time.time() - start))
+
+
+def report(results, elapsed):
+    """Print throughput and latency percentiles grouped by request kind."""
+    print('{0} requests in {1:.2f} seconds ({2:.1f} req/s)'
+          .format(len(results), elapsed, len(results) / elapsed))
+    kinds = sorted(set(x[0] for x in results))
+    print('{0:>12} {1:>7} {2:>7} {3:>9} {4:>9} {5:>9} {6:>9}'
+          .format('kind', 'count', 'errors', 'p50 ms', 'p90 ms', 'p99 ms',
+                  'max ms'))
+    for kind in kinds:
+        subset = [x for x in results if x[0] == kind]
+        latencies = sorted(x[2] * 1000 for x in subset)
+        errors = sum(1 for x in subset if x[1] is None or x[1] >= 500)
+        print('{0:>12} {1:>7} {2:>7} {3:>9.2f} {4:>9.2f} {5:>9.2f} {6:>9.2f}'
+              .format(kind, len(subset), errors, percentile(latencies, .5),
+                      percentile(latencies, .9),
+                      percentile(latencies, .99), latencies[-1]))
+    statuses = {}
+    for result in results:
+        statuses[result[1]] = statuses.get(result[1], 0) + 1
+    print('status codes: {0}'.format(', '.join(
+        '{0}={1}'.format(k, v) for k, v in sorted(statuses.items(),
+                                                  key=lambda x: str(x[0])))))
+
+
+def main():
+    parser = OptionParser(usage='Usage: %prog [options]')
+    parser.add_option('-c', '--concurrency', type='int', default=8,
+                      help='Number of concurrent clients (default: %default)')
+    parser.add_option('-n', '--requests', type='int', default=1000,
+                      help='Total number of requests (default: %default)')
+    parser.add_option('-g', '--get-ratio', type='float', default=0.5,
+                      help='Fraction of requests that are GETs of an item '
+                      '(default: %default)')
+    parser.add_option('-i', '--invalid-ratio', type='float', default=0.1,
+                      help='Fraction of PUTs that fail validation '
+                      '(default: %default)')
+    parser.add_option('-s', '--size', type='int', default=64,
+                      help='Approximate size of the PUT item value '
+                      '(default: %default)')
+    parser.add_option('-m', '--max-item-id', type='int', default=1,
+                      help='GET item ids are chosen from 0 through this value '
+                      '(default: %default)')
+    parser.add_option('-u', '--url', default=BASE_URL,
+                      help='Base url of the example app (default: %default)')
+    options, args = parser.parse_args()
+    if args or options.concurrency < 1 or options.requests < 1:
+        parser.print_usage()
+        return 1
+
+    per_worker, extra = divmod(options.requests, options.concurrency)
+    workers = [Worker(options, per_worker + (1 if i < extra else 0))
+               for i in range(options.concurrency)]
+    start = time.time()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.time() - start
+    results = [x for worker in workers for x in worker.results]
+    report(results, elapsed)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
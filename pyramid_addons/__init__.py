@@ -1 +1,3 @@
+from .validation import includeme  # NOQA
+
 __version__ = '0.21'
@@ -0,0 +1,128 @@
+import os
+import sqlite3
+import threading
+import time
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle  # NOQA
+
+
+class SharedCache(object):
+
+    """A cache that is shared by all processes on a host.
+
+    Entries are stored in a SQLite database file so that every worker process
+    that opens the same `path` sees the same entries. Setting, invalidating or
+    clearing entries is therefore immediately visible to all the workers.
+    Values must be picklable.
+
+    Entries are unpickled when read, so anyone able to write to the database
+    can execute code in every process using the cache. The file must be in a
+    directory that only the service's user can write to, never a shared one
+    such as /tmp.
+
+    """
+
+    def __init__(self, path, ttl=None, max_entries=None, trim_interval=100):
+        """Create a SharedCache instance.
+
+        :param path: The path to the database file shared by the processes. It
+            is created with 0600 permissions if missing. A ValueError is raised
+            when the file is not owned by the current user or is accessible by
+            other users.
+        :param ttl: The default number of seconds an entry is valid for. When
+            None, entries do not expire.
+        :param max_entries: The approximate maximum number of entries to keep.
+            When exceeded the least recently set entries are removed. When
+            None, the number of entries is unbounded.
+        :param trim_interval: The number of sets each process performs between
+            removing expired and excess entries.
+
+        """
+        self.check_permissions(path)
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.trim_interval = trim_interval
+        self.local = threading.local()
+        self.sets = 0
+        self.sets_lock = threading.Lock()
+        self._execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY '
+                      'KEY, value BLOB NOT NULL, expires REAL, stored REAL '
+                      'NOT NULL)')
+        self._execute('CREATE INDEX IF NOT EXISTS cache_stored ON '
+                      'cache (stored)')
+
+    @staticmethod
+    def check_permissions(path):
+        """Create `path` if needed and verify only its owner can access it."""
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, 'O_NOFOLLOW', 0)
+        descriptor = os.open(path, flags, 0o600)
+        try:
+            stat = os.fstat(descriptor)
+        finally:
+            os.close(descriptor)
+        if hasattr(os, 'getuid') and stat.st_uid != os.getuid() or \
+                stat.st_mode & 0o077:
+            raise ValueError('{0} must be owned by the current user and not '
+                             'be accessible by other users'.format(path))
+
+    @property
+    def connection(self):
+        """Return a connection for the current process and thread."""
+        # Connections cannot be shared across threads or forked processes
+        if getattr(self.local, 'pid', None) != os.getpid():
+            self.local.connection = sqlite3.connect(
+                self.path, timeout=10, isolation_level=None)
+            self.local.connection.execute('PRAGMA journal_mode=WAL')
+            self.local.connection.execute('PRAGMA synchronous=OFF')
+            self.local.pid = os.getpid()
+        return self.local.connection
+
+    def _execute(self, query, *args):
+        return self.connection.execute(query, args)
+
+    def clear(self):
+        """Remove all entries."""
+        self._execute('DELETE FROM cache')
+
+    def get(self, key, default=None):
+        """Return the value of `key` or `default` when missing or expired."""
+        row = self._execute('SELECT value, expires FROM cache WHERE key = ?',
+                            key).fetchone()
+        if row is None or row[1] is not None and row[1] <= time.time():
+            return default
+        return pickle.loads(bytes(row[0]))
+
+    def invalidate(self, key):
+        """Remove the entry for `key` from the cache of every process."""
+        self._execute('DELETE FROM cache WHERE key = ?', key)
+
+    def set(self, key, value, ttl=None):
+        """Store `value` for `key`.
+
+        :param ttl: The number of seconds the entry is valid for. When None,
+            use the cache's default `ttl`.
+
+        """
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        expires = None if ttl is None else now + ttl
+        data = sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        self._execute('INSERT OR REPLACE INTO cache (key, value, expires, '
+                      'stored) VALUES (?, ?, ?, ?)', key, data, expires, now)
+        with self.sets_lock:
+            self.sets += 1
+            trim = self.sets % self.trim_interval == 0
+        if trim:
+            self.trim()
+
+    def trim(self):
+        """Remove the expired entries and those beyond `max_entries`."""
+        self._execute('DELETE FROM cache WHERE expires <= ?', time.time())
+        if self.max_entries is not None:
+            self._execute('DELETE FROM cache WHERE key IN (SELECT key FROM '
+                          'cache ORDER BY stored DESC, rowid DESC LIMIT -1 '
+                          'OFFSET ?)',
+                          self.max_entries)
@@ -6,9 +6,14 @@ except ImportError:
     # pylint: disable=F0401
     from configparser import RawConfigParser  # NOQA
     # pylint: enable=F0401
+import hashlib
+import json
 from datetime import datetime, timedelta, tzinfo
 from pyramid.httpexceptions import (HTTPBadRequest, HTTPConflict, HTTPCreated,
-                                    HTTPForbidden, HTTPGone, HTTPOk)
+                                    HTTPForbidden, HTTPGone, HTTPNotModified,
+                                    HTTPOk, HTTPServiceUnavailable)
+from webob.datetime_utils import parse_date
+from webob.etag import ETagMatcher
 
 
 def http_bad_request(request, **kwargs):
@@ -47,6 +52,73 @@ def http_ok(request, **kwargs):
     return kwargs
 
 
+def http_ok_conditional(request, etag=None, last_modified=None, **kwargs):
+    """Return like http_ok unless the client's copy is current.
+
+    When the request's If-None-Match header matches `etag`, or it has no
+    If-None-Match header and its If-Modified-Since header is not before
+    `last_modified`, a 304 Not Modified response is returned so that the
+    renderer is skipped entirely.
+
+    :param etag: A value, such as a version number, an `updated_at` time or
+        a tuple of ids, that changes whenever the response does. Routes that
+        are requested often should provide it as it is cheap to compute.
+        When None, it is derived from a hash of the kwargs serialized as json,
+        using the `__json__` method of objects that have one as the json
+        renderer does, and the serialized kwargs are returned as the body of
+        `request.response` so that they are not serialized again by the
+        renderer. A TypeError is raised when the kwargs contain other values
+        that cannot be serialized, in which case the etag must be provided.
+    :param last_modified: An optional datetime the response last changed at.
+        Naive datetimes are treated as UTC.
+
+    """
+    body = None
+    if etag is None:
+        def default(obj):
+            if hasattr(obj, '__json__'):
+                return obj.__json__(request)
+            raise TypeError('Cannot derive an etag from {0!r}; provide the '
+                            'etag argument'.format(obj))
+        body = json.dumps(kwargs, sort_keys=True,
+                          default=default).encode('utf-8')
+        etag = hashlib.sha1(body).hexdigest()
+    else:
+        etag = str(etag)
+    if last_modified is not None and not last_modified.tzinfo:
+        last_modified = last_modified.replace(tzinfo=UTC())
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        not_modified = etag in ETagMatcher.parse(if_none_match, strong=False)
+    elif last_modified is not None:
+        since = parse_date(request.headers.get('If-Modified-Since'))
+        not_modified = since is not None and \
+            last_modified.replace(microsecond=0) <= since
+    else:
+        not_modified = False
+
+    response = HTTPNotModified() if not_modified else request.response
+    response.etag = etag
+    if last_modified is not None:
+        response.last_modified = last_modified
+    if not_modified:
+        return response
+    if body is not None:
+        # Returning the response bypasses the renderer
+        response.status = HTTPOk.code
+        response.content_type = 'application/json'
+        response.body = body
+        return response
+    return http_ok(request, **kwargs)
+
+
+def http_service_unavailable(request, **kwargs):
+    request.response.status = HTTPServiceUnavailable.code
+    kwargs.setdefault('error', 'Service unavailable')
+    return kwargs
+
+
 def load_settings(config_file):
     config = RawConfigParser()
     if not config.read(config_file):
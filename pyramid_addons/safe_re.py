@@ -0,0 +1,368 @@
+"""Protection against regular expressions that backtrack catastrophically.
+
+`has_exponential_backtracking` inspects a pattern for the nested, ambiguous
+repetition that causes Python's backtracking engine to take exponential time.
+`LinearPattern` matches the supported subset of Python's regular expression
+syntax in time proportional to the length of the input.
+
+"""
+import re
+import unicodedata
+try:
+    from re import _compiler as sre_compile, _parser as sre_parse  # 3.11+
+except ImportError:
+    import sre_compile  # NOQA
+    import sre_parse  # NOQA
+try:
+    chr_ = unichr  # pylint: disable=C0103
+except NameError:
+    chr_ = chr  # pylint: disable=C0103
+
+ASCII = getattr(re, 'ASCII', 0)
+MAXREPEAT = sre_parse.MAXREPEAT
+REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+
+# Repeats whose maximum exceeds this are treated as unbounded
+LARGE_REPEAT = 8
+# The maximum number of instructions a LinearPattern may compile to
+MAX_PROGRAM = 10000
+
+# LinearPattern instructions
+CHAR, SPLIT, JUMP, ASSERT, MATCH = range(5)
+
+
+def _parse(pattern):
+    """Return the parsed pattern and its flags."""
+    flags = 0
+    if hasattr(pattern, 'pattern'):
+        pattern, flags = pattern.pattern, pattern.flags
+    parsed = sre_parse.parse(pattern, flags)
+    return parsed, _state(parsed).flags
+
+
+def _state(parsed):
+    """Return the state shared by the items of a parsed pattern."""
+    return getattr(parsed, 'state', None) or parsed.pattern
+
+
+def _subpattern(av):
+    """Return the (add_flags, del_flags, items) of a SUBPATTERN argument."""
+    if len(av) == 4:
+        return av[1], av[2], av[3]
+    return 0, 0, av[1]  # Python < 3.6
+
+
+def _children(op, av):
+    """Return the item sequences directly nested within an item."""
+    if op in REPEATS:
+        return [av[2]]
+    elif op == sre_parse.SUBPATTERN:
+        return [_subpattern(av)[2]]
+    elif op == sre_parse.BRANCH:
+        return av[1]
+    elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+        return [av[1]]
+    elif op == getattr(sre_parse, 'ATOMIC_GROUP', None):
+        return [av]
+    elif op == getattr(sre_parse, 'POSSESSIVE_REPEAT', None):
+        return [av[2]]
+    elif op == sre_parse.GROUPREF_EXISTS:
+        return [x for x in av[1:] if x is not None]
+    return []
+
+
+def _nullable(items):
+    """Return True if the sequence of items can match the empty string."""
+    for op, av in items:
+        if op in (sre_parse.LITERAL, sre_parse.NOT_LITERAL, sre_parse.ANY,
+                  sre_parse.IN, sre_parse.CATEGORY):
+            return False
+        elif op in REPEATS:
+            if av[0] > 0 and not _nullable(av[2]):
+                return False
+        elif op == sre_parse.SUBPATTERN:
+            if not _nullable(_subpattern(av)[2]):
+                return False
+        elif op == sre_parse.BRANCH:
+            if not any(_nullable(x) for x in av[1]):
+                return False
+    return True
+
+
+def _exposes_variable_repeat(items):
+    """Return True if a variable repeat can match while its siblings do not.
+
+    When such a sequence is itself repeated, the same input can be split
+    between the iterations in exponentially many ways.
+
+    """
+    for i, (op, av) in enumerate(items):
+        if not _nullable(list(items[:i]) + list(items[i + 1:])):
+            continue
+        if op in REPEATS:
+            if av[1] > 1 and av[1] > av[0] or _exposes_variable_repeat(av[2]):
+                return True
+        elif op == sre_parse.SUBPATTERN:
+            if _exposes_variable_repeat(_subpattern(av)[2]):
+                return True
+        elif op == sre_parse.BRANCH:
+            if any(_exposes_variable_repeat(x) for x in av[1]):
+                return True
+    return False
+
+
+def _is_dangerous(items):
+    for op, av in items:
+        if op in REPEATS and (av[1] == MAXREPEAT or av[1] > LARGE_REPEAT) \
+                and _exposes_variable_repeat(av[2]):
+            return True
+        if any(_is_dangerous(x) for x in _children(op, av)):
+            return True
+    return False
+
+
+def has_exponential_backtracking(pattern):
+    """Return True if `pattern` may take exponential time to search.
+
+    The check flags patterns such as `(a+)+`, `(a*)*` and `(\\w+\\s?)*` where a
+    repeated group contains a variable repeat that the rest of the group does
+    not delimit. Ambiguous alternation, such as `(a|aa)+`, is not detected.
+
+    :param pattern: A pattern string or compiled regular expression.
+
+    """
+    return _is_dangerous(_parse(pattern)[0])
+
+
+def _is_word(char, flags):
+    if flags & ASCII:
+        return char < '\x80' and (char.isalnum() or char == '_')
+    return char.isalnum() or char == '_'
+
+
+def _category(category, flags):
+    """Return a predicate for a CATEGORY (such as \\d) item."""
+    name = str(category).upper().replace('UNI_', '').replace('LOC_', '')
+    negate = 'NOT_' in name
+    if name.endswith('DIGIT'):
+        def test(char):
+            return unicodedata.decimal(char, None) is not None
+    elif name.endswith('SPACE'):
+        def test(char):
+            return char.isspace()
+    elif name.endswith('WORD'):
+        def test(char):
+            return _is_word(char, flags)
+    elif name.endswith('LINEBREAK'):
+        def test(char):
+            return char == '\n'
+    else:
+        raise ValueError('unsupported category: {0}'.format(name))
+    if flags & ASCII:
+        ascii_test = test
+
+        def test(char):  # pylint: disable=E0102
+            return char < '\x80' and ascii_test(char)
+    if negate:
+        return lambda char: not test(char)
+    return test
+
+
+def _ignorecase(item, state, flags):
+    """Return a predicate for a character item matched case-insensitively.
+
+    The item is compiled by itself with `re` so that characters are folded
+    exactly as `re` folds them, including folds such as KELVIN SIGN to `k`
+    that lower() and upper() miss.
+
+    """
+    return sre_compile.compile(sre_parse.SubPattern(state, [item]),
+                               flags).match
+
+
+def _in_predicate(items, flags):
+    """Return a predicate for an IN (character set) item."""
+    chars = set()
+    ranges = []
+    tests = []
+    negate = False
+    for op, av in items:
+        if op == sre_parse.NEGATE:
+            negate = True
+        elif op == sre_parse.LITERAL:
+            chars.add(chr_(av))
+        elif op == sre_parse.RANGE:
+            ranges.append(av)
+        elif op == sre_parse.CATEGORY:
+            tests.append(_category(av, flags))
+        else:
+            raise ValueError('unsupported set item: {0}'.format(op))
+
+    def test(char):
+        if char in chars:
+            return True
+        code = ord(char)
+        for low, high in ranges:
+            if low <= code <= high:
+                return True
+        for other in tests:
+            if other(char):
+                return True
+        return False
+    if negate:
+        return lambda char: not test(char)
+    return test
+
+
+class LinearPattern(object):
+
+    """A regular expression searched in time linear to the input's length.
+
+    The pattern is compiled to a non-deterministic automaton whose states are
+    advanced together, one input character at a time, rather than by
+    backtracking. Backreferences, lookaround assertions, atomic groups and
+    possessive repeats cannot be matched this way and raise a ValueError.
+
+    """
+
+    def __init__(self, pattern):
+        """Create a LinearPattern instance.
+
+        :param pattern: A pattern string or compiled regular expression.
+
+        """
+        parsed, flags = _parse(pattern)
+        self.pattern = getattr(pattern, 'pattern', pattern)
+        self.flags = flags
+        self.program = []
+        self.state = _state(parsed)
+        self._compile(parsed, flags)
+        self._emit(MATCH)
+
+    def __repr__(self):
+        return 'LinearPattern({0!r})'.format(self.pattern)
+
+    def _emit(self, *instruction):
+        if len(self.program) >= MAX_PROGRAM:
+            raise ValueError('pattern is too large to match in linear time')
+        self.program.append(list(instruction))
+        return len(self.program) - 1
+
+    def _compile(self, items, flags):
+        for op, av in items:
+            self._compile_item(op, av, flags)
+
+    def _compile_item(self, op, av, flags):
+        # pylint: disable=R0912
+        if flags & re.IGNORECASE and op in (sre_parse.LITERAL,
+                                            sre_parse.NOT_LITERAL,
+                                            sre_parse.IN):
+            self._emit(CHAR, _ignorecase((op, av), self.state, flags))
+        elif op == sre_parse.LITERAL:
+            literal = chr_(av)
+            self._emit(CHAR, lambda char: char == literal)
+        elif op == sre_parse.NOT_LITERAL:
+            literal = chr_(av)
+            self._emit(CHAR, lambda char: char != literal)
+        elif op == sre_parse.ANY:
+            if flags & re.DOTALL:
+                self._emit(CHAR, lambda char: True)
+            else:
+                self._emit(CHAR, lambda char: char != '\n')
+        elif op == sre_parse.IN:
+            self._emit(CHAR, _in_predicate(av, flags))
+        elif op == sre_parse.CATEGORY:
+            self._emit(CHAR, _category(av, flags))
+        elif op == sre_parse.AT:
+            self._emit(ASSERT, av, flags)
+        elif op == sre_parse.SUBPATTERN:
+            add_flags, del_flags, items = _subpattern(av)
+            self._compile(items, (flags | add_flags) & ~del_flags)
+        elif op == sre_parse.BRANCH:
+            jumps = []
+            for alternative in av[1][:-1]:
+                split = self._emit(SPLIT, None, None)
+                self.program[split][1] = split + 1
+                self._compile(alternative, flags)
+                jumps.append(self._emit(JUMP, None))
+                self.program[split][2] = len(self.program)
+            self._compile(av[1][-1], flags)
+            for jump in jumps:
+                self.program[jump][1] = len(self.program)
+        elif op in REPEATS:
+            minimum, maximum, items = av
+            for _ in range(minimum):
+                self._compile(items, flags)
+            if maximum == MAXREPEAT:
+                split = self._emit(SPLIT, None, None)
+                self.program[split][1] = split + 1
+                self._compile(items, flags)
+                self._emit(JUMP, split)
+                self.program[split][2] = len(self.program)
+            else:
+                splits = []
+                for _ in range(maximum - minimum):
+                    split = self._emit(SPLIT, None, None)
+                    self.program[split][1] = split + 1
+                    splits.append(split)
+                    self._compile(items, flags)
+                for split in splits:
+                    self.program[split][2] = len(self.program)
+        else:
+            raise ValueError('{0} is not supported in linear time matching'
+                             .format(op))
+
+    @staticmethod
+    def _assertion(kind, flags, text, pos):
+        # pylint: disable=R0911
+        end = len(text)
+        if kind == sre_parse.AT_BEGINNING_STRING:
+            return pos == 0
+        elif kind == sre_parse.AT_BEGINNING:
+            return pos == 0 or flags & re.MULTILINE and text[pos - 1] == '\n'
+        elif kind == sre_parse.AT_END_STRING:
+            return pos == end
+        elif kind == sre_parse.AT_END:
+            return (pos == end or pos == end - 1 and text[pos] == '\n' or
+                    flags & re.MULTILINE and text[pos] == '\n')
+        before = pos > 0 and _is_word(text[pos - 1], flags)
+        after = pos < end and _is_word(text[pos], flags)
+        if kind == sre_parse.AT_BOUNDARY:
+            return before != after
+        elif kind == sre_parse.AT_NON_BOUNDARY:
+            return end > 0 and before == after
+        raise ValueError('unsupported assertion: {0}'.format(kind))
+
+    def search(self, text):
+        """Return True if the pattern matches anywhere within `text`."""
+        program = self.program
+        pending = []
+        for pos in range(len(text) + 1):
+            # Start a new thread at each position and follow the empty
+            # transitions of every thread to the instructions that consume
+            pending.append(0)
+            seen = set()
+            waiting = []
+            while pending:
+                counter = pending.pop()
+                if counter in seen:
+                    continue
+                seen.add(counter)
+                instruction = program[counter]
+                opcode = instruction[0]
+                if opcode == CHAR:
+                    waiting.append((instruction[1], counter + 1))
+                elif opcode == SPLIT:
+                    pending.extend((instruction[2], instruction[1]))
+                elif opcode == JUMP:
+                    pending.append(instruction[1])
+                elif opcode == ASSERT:
+                    if self._assertion(instruction[1], instruction[2], text,
+                                       pos):
+                        pending.append(counter + 1)
+                else:
+                    return True
+            if pos < len(text):
+                char = text[pos]
+                pending = [x[1] for x in waiting if x[0](char)]
+        return False
@@ -1,13 +1,39 @@
 from __future__ import unicode_literals
 
+import hashlib
+import io
+import os
 import re
+import shutil
+import tempfile
 import unittest
+import warnings
 from datetime import datetime
+from pyramid.config import Configurator
+from pyramid.request import Request
 from pyramid.testing import DummyRequest
-from pyramid_addons.helpers import UTC, pretty_date
-from pyramid_addons.validation import (And, EmailAddress, Enum, Equals, List,
-                                       Or, String, TextNumber, RegexString,
-                                       SOURCE_GET, WhiteSpaceString, validate)
+from pyramid.view import view_config
+from pyramid_addons.cache import SharedCache
+from pyramid_addons.helpers import (UTC, http_created, http_ok_conditional,
+                                    pretty_date)
+from pyramid_addons.safe_re import LinearPattern, has_exponential_backtracking
+from pyramid_addons.validation import (And, Binary, Dict, EmailAddress, Enum,
+                                       Equals, File, List, Or, String,
+                                       TextNumber, RegexString, SOURCE_GET,
+                                       SOURCE_MSGPACK_BODY, SOURCES,
+                                       ValidateAbort, WhiteSpaceString,
+                                       register_source, text_type, validate,
+                                       validate_batch)
+try:
+    import msgpack
+except ImportError:
+    msgpack = None  # pylint: disable=C0103
+
+
+@view_config(route_name='scanned', renderer='json')
+@validate(number=Or('number', TextNumber(''), Equals('', 1)))
+def scanned_view(_, number):
+    return {'number': number}
 
 
 class PrettyDateTest(unittest.TestCase):
@@ -19,6 +45,133 @@ class PrettyDateTest(unittest.TestCase):
         self.assertEqual('just now', pretty_date(datetime.now(UTC())))
 
 
+class HttpOkConditionalTest(unittest.TestCase):
+    MODIFIED = datetime(2013, 1, 2, 3, 4, 5)
+
+    def test_derived_etag(self):
+        request = DummyRequest()
+        response = http_ok_conditional(request, a=1)
+        self.assertTrue(response is request.response)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({'a': 1}, response.json_body)
+        etag = request.response.etag
+        self.assertTrue(etag)
+        request = DummyRequest(headers={'If-None-Match': '"{0}"'
+                                        .format(etag)})
+        self.assertEqual(304, http_ok_conditional(request, a=1).status_code)
+        request = DummyRequest(headers={'If-None-Match': '"{0}"'
+                                        .format(etag)})
+        self.assertEqual({'a': 2},
+                         http_ok_conditional(request, a=2).json_body)
+
+    def test_derived_etag_json_method(self):
+        class Thing(object):
+            def __init__(self):
+                self.value = 1
+
+            def __json__(self, _):
+                return {'value': self.value}
+        thing = Thing()
+        request = DummyRequest()
+        http_ok_conditional(request, thing=thing)
+        headers = {'If-None-Match': '"{0}"'.format(request.response.etag)}
+        thing.value = 2
+        request = DummyRequest(headers=headers)
+        self.assertEqual({'thing': {'value': 2}},
+                         http_ok_conditional(request, thing=thing).json_body)
+        self.assertEqual(200, request.response.status_code)
+
+    def test_derived_etag_unserializable(self):
+        self.assertRaises(TypeError, http_ok_conditional, DummyRequest(),
+                          thing=object())
+
+    def test_modified_since(self):
+        headers = {'If-Modified-Since': 'Wed, 02 Jan 2013 03:04:05 GMT'}
+        request = DummyRequest(headers=headers)
+        response = http_ok_conditional(request, last_modified=self.MODIFIED,
+                                       a=1)
+        self.assertEqual(304, response.status_code)
+        request = DummyRequest(headers=headers)
+        self.assertEqual({'a': 1}, http_ok_conditional(
+            request, last_modified=self.MODIFIED.replace(second=6),
+            a=1).json_body)
+        self.assertEqual(200, request.response.status_code)
+
+    def test_version_etag(self):
+        request = DummyRequest(headers={'If-None-Match': 'W/"5", "6"'})
+        response = http_ok_conditional(request, etag=6, a=1)
+        self.assertEqual(304, response.status_code)
+        self.assertEqual('"6"', response.headers['ETag'])
+        request = DummyRequest(headers={'If-None-Match': '"5"'})
+        self.assertEqual({'a': 1}, http_ok_conditional(request, etag=6, a=1))
+        self.assertEqual('6', request.response.etag)
+
+
+class SafeReTest(unittest.TestCase):
+    def test_exponential(self):
+        for pattern in ('(a+)+', '(a*)*b', r'(\w+\s?)*$', '(a{1,2})+',
+                        '(x|a+)+'):
+            self.assertTrue(has_exponential_backtracking(pattern), pattern)
+
+    def test_not_exponential(self):
+        for pattern in ('foo', '(ab+)+', 'a+b+', '(aa)+', r'\d+(\.\d+)*',
+                        r'^\s+|\s+$'):
+            self.assertFalse(has_exponential_backtracking(pattern), pattern)
+
+    def test_matches_re(self):
+        texts = ('', 'a', 'ab', 'Abc', 'x\nb', 'foo bar', 'a1-b2', 'aaab',
+                 '\u017f', '\u212a', 'S\u212a')
+        for pattern in (r'^a', r'b$', r'(?i)abc', r'[^a-z]', r'\bba',
+                        r'\Bo', r'a{2,3}b', r'(ab|cd)+', r'(?m)^b', r'(?s)x.b',
+                        r'[\w-]+\d', r'\s\S', r'(a|)*b', r'(a+)+$', r'(?i)s',
+                        r'(?i)[k]', r'(?i)[^s]', r'(?i)[a-z]k', r'(?i)[^k]$'):
+            compiled = re.compile(pattern)
+            linear = LinearPattern(pattern)
+            for text in texts:
+                self.assertEqual(bool(compiled.search(text)),
+                                 linear.search(text), (pattern, text))
+
+
+class SharedCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_creates_private_file(self):
+        SharedCache(self.path)
+        self.assertEqual(0o600, os.stat(self.path).st_mode & 0o777)
+
+    def test_rejects_accessible_file(self):
+        open(self.path, 'w').close()
+        os.chmod(self.path, 0o644)
+        self.assertRaises(ValueError, SharedCache, self.path)
+
+    def test_expired(self):
+        cache = SharedCache(self.path, ttl=-1)
+        cache.set('key', 'value')
+        self.assertEqual(None, cache.get('key'))
+        cache.set('key', 'value', ttl=60)
+        self.assertEqual('value', cache.get('key'))
+
+    def test_invalidate_shared(self):
+        cache = SharedCache(self.path)
+        other = SharedCache(self.path)
+        cache.set('key', {'a': [1, 2]})
+        self.assertEqual({'a': [1, 2]}, other.get('key'))
+        other.invalidate('key')
+        self.assertEqual('missing', cache.get('key', 'missing'))
+
+    def test_max_entries(self):
+        cache = SharedCache(self.path, max_entries=2, trim_interval=1)
+        for i in range(4):
+            cache.set(str(i), i)
+        self.assertEqual([None, None], [cache.get('0'), cache.get('1')])
+        self.assertEqual([2, 3], [cache.get('2'), cache.get('3')])
+
+
 class AndTest(unittest.TestCase):
     def test_fail_all(self):
         validator = And('field', Equals('', 'yes'), Equals('', 'yes'))
@@ -45,6 +198,54 @@ class AndTest(unittest.TestCase):
         self.assertEqual(0, len(errors))
 
 
+class BinaryTest(unittest.TestCase):
+    def test_fail_alphabet(self):
+        validator = Binary('field')
+        errors = []
+        validator('aGV$bG8=', errors, None)
+        self.assertEqual(1, len(errors))
+
+    def test_fail_length_multiple(self):
+        validator = Binary('field')
+        errors = []
+        validator('aGVsbG8', errors, None)
+        self.assertEqual(1, len(errors))
+
+    def test_fail_too_long(self):
+        validator = Binary('field', max_length=4)
+        errors = []
+        self.assertEqual('aGVsbG8=', validator('aGVsbG8=', errors, None))
+        self.assertEqual(['Validation error on param \'field\': must be <= 4 '
+                          'bytes'], errors)
+
+    def test_fail_too_short(self):
+        validator = Binary('field', min_length=6)
+        errors = []
+        validator('aGVsbG8=', errors, None)
+        self.assertEqual(1, len(errors))
+
+    def test_fail_type(self):
+        validator = Binary('field')
+        errors = []
+        validator(b'aGVsbG8=', errors, None)
+        self.assertEqual(1, len(errors))
+
+    def test_pass(self):
+        validator = Binary('field', min_length=5, max_length=5)
+        errors = []
+        value = validator('aGVsbG8=', errors, None)
+        self.assertEqual(0, len(errors))
+        self.assertTrue(isinstance(value, memoryview))
+        self.assertEqual(b'hello', value.tobytes())
+
+    def test_pass_urlsafe(self):
+        validator = Binary('field', urlsafe=True)
+        errors = []
+        value = validator('-_-_', errors, None)
+        self.assertEqual(0, len(errors))
+        self.assertEqual(b'\xfb\xff\xbf', value.tobytes())
+
+
 class DecoratorTest(unittest.TestCase):
     @staticmethod
     @validate(required=String('field_1'),
@@ -79,6 +280,225 @@ class DecoratorTest(unittest.TestCase):
         self.assertEqual(200, request.response.status_code)
 
 
+class SourceTest(unittest.TestCase):
+    def setUp(self):
+        self.loads = []
+
+        def loader(request):
+            self.loads.append(request)
+            return {'field_1': 'custom_1', 'field_2': 'custom_2'}
+        register_source('custom', loader)
+
+    def tearDown(self):
+        del SOURCES['custom']
+
+    def test_json_body_shared(self):
+        @validate(ids=List('ids', TextNumber('')), raw=List('ids', String('')))
+        def dummy_function(_, ids, raw):
+            return ids, raw
+        request = Request.blank('/', method='PUT', body=b'{"ids": ["1","2"]}')
+        request.registry = Configurator().registry
+        self.assertEqual(([1, 2], ['1', '2']), dummy_function(request))
+
+    def test_loaded_once(self):
+        @validate(first=String('field_1', source='custom'),
+                  second=String('field_2', source='custom'))
+        def dummy_function(_, first, second):
+            return first, second
+        request = DummyRequest()
+        self.assertEqual(('custom_1', 'custom_2'), dummy_function(request))
+        self.assertEqual([request], self.loads)
+
+    def test_loader_value_error(self):
+        def loader(_):
+            raise ValueError('undecodable')
+        register_source('custom', loader)
+
+        @validate(first=String('field_1', source='custom'))
+        def dummy_function(_, first):
+            return first
+        request = DummyRequest()
+        retval = dummy_function(request)  # pylint: disable=E1120
+        self.assertEqual(400, request.response.status_code)
+        self.assertEqual(['Missing custom parameter: field_1'],
+                         retval['messages'])
+
+    @unittest.skipIf(msgpack is None, 'msgpack is not installed')
+    def test_msgpack_body(self):
+        @validate(first=String('field_1', source=SOURCE_MSGPACK_BODY))
+        def dummy_function(_, first):
+            return first
+        request = DummyRequest(body=msgpack.packb({'field_1': 'packed_1'}))
+        self.assertEqual('packed_1', dummy_function(request))
+
+    @unittest.skipIf(msgpack is not None, 'msgpack is installed')
+    def test_msgpack_missing(self):
+        self.assertRaises(ImportError, String, 'field_1',
+                          source=SOURCE_MSGPACK_BODY)
+
+    def test_unregistered_attribute(self):
+        @validate(first=String('field_1', source='params'))
+        def dummy_function(_, first):
+            return first
+        request = DummyRequest(params={'field_1': 'param_1'})
+        self.assertEqual('param_1', dummy_function(request))
+
+
+class IncludemeTest(unittest.TestCase):
+    @staticmethod
+    def scan(include):
+        config = Configurator()
+        if include:
+            config.include('pyramid_addons')
+        config.add_route('scanned', '/scanned')
+        config.scan('pyramid_addons.tests')
+        config.commit()
+        return config.registry.introspector.get_category('validation schemas',
+                                                         [])
+
+    def test_included(self):
+        intrs = self.scan(True)
+        self.assertEqual(1, len(intrs))
+        intr = intrs[0]['introspectable']
+        self.assertEqual(scanned_view.validators, intr['schema'])
+        self.assertEqual(['scanned'], intr['routes'])
+        self.assertTrue(intr['setup_time'] >= 0)
+        self.assertTrue(int in scanned_view.validators['number'].candidates)
+
+    def test_not_included(self):
+        self.assertEqual([], self.scan(False))
+
+
+class BatchDecoratorTest(unittest.TestCase):
+    @staticmethod
+    @validate_batch(max_operations=3, name=String('name', min_length=2),
+                    suffix=String('suffix', source=SOURCE_GET, optional=True,
+                                  default=''))
+    def dummy_function(request, name, suffix):
+        return http_created(request, headers=[('Location', name)],
+                            name=name + suffix)
+
+    @staticmethod
+    @validate_batch(bulk=True, name=String('name', min_length=2))
+    def dummy_bulk_function(_, operations):
+        return {'names': [x['name'] for x in operations]}
+
+    def test_bulk(self):
+        request = DummyRequest(json_body=[{'name': 'ab'}, {'name': 'cd'}])
+        # pylint: disable=E1120
+        self.assertEqual({'names': ['ab', 'cd']},
+                         self.dummy_bulk_function(request))
+
+    def test_bulk_invalid(self):
+        request = DummyRequest(json_body=[{'name': 'ab'}, {'name': 'c'}])
+        retval = self.dummy_bulk_function(request)  # pylint: disable=E1120
+        self.assertEqual(400, request.response.status_code)
+        self.assertEqual(None, retval['results'][0])
+        self.assertEqual(400, retval['results'][1]['status'])
+
+    def test_shared_validated_once(self):
+        calls = []
+
+        class Counter(String):
+            def run(self, *args):
+                calls.append(args[0])
+                return super(Counter, self).run(*args)
+
+        @validate_batch(name=String('name'),
+                        item=Counter('item_id', source='matchdict'))
+        def dummy_function(_, name, item):
+            return {'name': name, 'item': item}
+        request = DummyRequest(json_body=[{'name': 'ab'}] * 5)
+        request.matchdict = {'item_id': '7'}
+        retval = dummy_function(request)  # pylint: disable=E1120
+        self.assertEqual(['7'], calls)
+        self.assertEqual([{'name': 'ab', 'item': '7'}] * 5,
+                         [x['body'] for x in retval['results']])
+
+    def test_shared_invalid(self):
+        request = DummyRequest(GET={'suffix': 1},
+                               json_body=[{'name': 'ab'}, {'name': 'c'}])
+        retval = self.dummy_function(request)  # pylint: disable=E1120
+        results = retval['results']
+        self.assertEqual([400, 400], [x['status'] for x in results])
+        self.assertEqual([1, 2], [len(x['body']['messages'])
+                                  for x in results])
+
+    def test_not_list(self):
+        request = DummyRequest(json_body={'name': 'ab'})
+        self.dummy_function(request)  # pylint: disable=E1120
+        self.assertEqual(400, request.response.status_code)
+
+    def test_too_many_operations(self):
+        request = DummyRequest(json_body=[{'name': 'ab'}] * 4)
+        self.dummy_function(request)  # pylint: disable=E1120
+        self.assertEqual(400, request.response.status_code)
+
+    def test_per_item(self):
+        request = DummyRequest(GET={'suffix': '!'},
+                               json_body=[{'name': 'ab'}, {'name': 'c'}, 1])
+        retval = self.dummy_function(request)  # pylint: disable=E1120
+        self.assertEqual(200, request.response.status_code)
+        self.assertEqual([], [x for x in request.response.headerlist
+                              if x[0] == 'Location'])
+        results = retval['results']
+        self.assertEqual({'status': 201, 'body': {'name': 'ab!'},
+                          'headers': {'Location': 'ab'}}, results[0])
+        self.assertEqual([400, 400], [x['status'] for x in results[1:]])
+        self.assertEqual(1, len(results[1]['body']['messages']))
+
+
+class DeadlineTest(unittest.TestCase):
+    @staticmethod
+    @validate(_timeout=-1, field=String('field_1'))
+    def expired_function(_, field):
+        return field
+
+    @staticmethod
+    @validate(_timeout=60, field=String('field_1'))
+    def dummy_function(_, field):
+        return field
+
+    def test_expired(self):
+        request = DummyRequest(json_body={'field_1': 'data_1'})
+        retval = self.expired_function(request)  # pylint: disable=E1120
+        self.assertEqual(503, request.response.status_code)
+        self.assertEqual(1, len(retval['messages']))
+        self.assertEqual(None, request.validation_deadline)
+
+    def test_list_expired(self):
+        request = DummyRequest()
+        request.validation_deadline = 0
+        validator = List('field', String(''))
+        self.assertRaises(ValidateAbort, validator, ['a'], [], request)
+        self.assertEqual([], validator([], [], request))
+
+    def test_batch_exception_restores_deadline(self):
+        class Raiser(String):
+            def run(self, *_):
+                raise RuntimeError()
+
+        @validate_batch(_timeout=60, field=Raiser('field_1'))
+        def dummy_function(_, field):
+            return field
+        request = DummyRequest(json_body=[{'field_1': 'data_1'}])
+        self.assertRaises(RuntimeError, dummy_function, request)
+        self.assertEqual(None, request.validation_deadline)
+
+    def test_timeout_param_name(self):
+        @validate(timeout=TextNumber('timeout'))
+        def dummy_function(_, timeout):
+            return timeout
+        request = DummyRequest(json_body={'timeout': '5'})
+        self.assertEqual(5, dummy_function(request))
+
+    def test_within_deadline(self):
+        request = DummyRequest(json_body={'field_1': 'data_1'})
+        # pylint: disable=E1120
+        self.assertEqual('data_1', self.dummy_function(request))
+        self.assertEqual(200, request.response.status_code)
+
+
 class EmailAddressTest(unittest.TestCase):
     def test_fail_no_at_symbol(self):
         validator = EmailAddress('field')
@@ -133,6 +553,192 @@ class EqualsTest(unittest.TestCase):
         self.assertEqual(0, len(errors))
 
 
+class DictTest(unittest.TestCase):
+    @staticmethod
+    def validator(**kwargs):
+        return Dict('field', String('name', min_length=2),
+                    TextNumber('age', optional=True, default=7),
+                    List('tags', String(''), optional=True), **kwargs)
+
+    def test_fail_invalid_value(self):
+        errors = []
+        self.validator()({'name': 'a'}, errors, None)
+        self.assertEqual(1, len(errors))
+        self.assertTrue('name' in errors[0])
+
+    def test_fail_max_depth(self):
+        errors = []
+        data = {'name': 'foo', 'tags': [['nested']]}
+        self.assertEqual(data, self.validator(max_depth=2)(data, errors, None))
+        self.assertEqual(1, len(errors))
+
+    def test_fail_max_depth_nested(self):
+        validator = Dict('field', List('items', Dict(
+            'item', Dict('child', max_depth=1, optional=True))), max_depth=3)
+        errors = []
+        validator({'items': [{'child': {}}]}, errors, None)
+        self.assertEqual(1, len(errors))
+        self.assertTrue('\'field\'' in errors[0] and '3 levels' in errors[0])
+        errors = []
+        validator = Dict('field', Dict('child', Dict('leaf', Dict('x'),
+                                                     max_depth=1)))
+        validator({'child': {'leaf': {'x': {}}}}, errors, None)
+        self.assertEqual(1, len(errors))
+        self.assertTrue('\'leaf\'' in errors[0] and '1 levels' in errors[0])
+
+    def test_max_depth_visits_once(self):
+        visits = []
+
+        class Object(dict):
+            def items(self):
+                visits.append(self)
+                return super(Object, self).items()
+
+            def values(self):
+                visits.append(self)
+                return super(Object, self).values()
+        inner = Object(name='a')
+        value = Object(items=[inner])
+        validator = Dict('field', List('items', Dict('', String('name'),
+                                                     max_depth=2)),
+                         max_depth=3)
+        errors = []
+        self.assertEqual({'items': [{'name': 'a'}]},
+                         validator(value, errors, None))
+        self.assertEqual([], errors)
+        self.assertEqual([value, inner], visits)
+
+    def test_fail_max_keys(self):
+        errors = []
+        data = {'name': 'foo', 'age': '1', 'tags': []}
+        self.assertEqual(data, self.validator(max_keys=2)(data, errors, None))
+        self.assertEqual(1, len(errors))
+
+    def test_fail_missing(self):
+        errors = []
+        self.validator()({'age': '1'}, errors, None)
+        self.assertEqual(['Validation error on param \'field\': missing key '
+                          '\'name\''], errors)
+
+    def test_fail_type(self):
+        errors = []
+        self.validator()(['name'], errors, None)
+        self.assertEqual(1, len(errors))
+
+    def test_fail_unknown(self):
+        errors = []
+        self.validator()({'name': 'foo', 'other': 1, 'more': 2}, errors,
+                         None)
+        self.assertEqual(2, len(errors))
+
+    def test_duplicate_key(self):
+        self.assertRaises(TypeError, Dict, 'field', String('name'),
+                          String('name'))
+
+    def test_pass(self):
+        errors = []
+        value = self.validator(max_keys=3, max_depth=2)(
+            {'name': ' foo ', 'tags': [' a ']}, errors, None)
+        self.assertEqual(0, len(errors))
+        self.assertEqual({'name': 'foo', 'age': 7, 'tags': ['a']}, value)
+
+    def test_decorator_missing_optional(self):
+        @validate(obj=Dict('obj', String('name'), optional=True, default={}))
+        def dummy_function(_, obj):
+            return obj
+        request = DummyRequest(json_body={})
+        self.assertEqual({}, dummy_function(request))
+        self.assertEqual(200, request.response.status_code)
+
+    def test_decorator_missing_required(self):
+        @validate(obj=Dict('obj', String('name'),
+                           TextNumber('age', optional=True)))
+        def dummy_function(_, obj):
+            return obj
+        request = DummyRequest(json_body={})
+        retval = dummy_function(request)  # pylint: disable=E1120
+        self.assertEqual(400, request.response.status_code)
+        self.assertEqual(['Missing json_body parameter: obj'],
+                         retval['messages'])
+
+    def test_pass_list_element(self):
+        validator = List('field', Dict(None, TextNumber('id')))
+        errors = []
+        value = validator([{'id': '1'}, {'id': '2'}], errors, None)
+        self.assertEqual(0, len(errors))
+        self.assertEqual([{'id': 1}, {'id': 2}], value)
+
+
+class DummyUpload(object):
+    def __init__(self, stream):
+        self.file = stream
+        self.filename = 'upload.png'
+
+
+class FileTest(unittest.TestCase):
+    PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 100
+
+    def test_fail_content_type(self):
+        validator = File('field', content_types=('image/jpeg',))
+        errors = []
+        validator(DummyUpload(io.BytesIO(self.PNG)), errors, None)
+        self.assertEqual(1, len(errors))
+
+    def test_fail_not_file(self):
+        validator = File('field')
+        errors = []
+        validator('data', errors, None)
+        self.assertEqual(1, len(errors))
+
+    def test_fail_too_large(self):
+        validator = File('field', max_size=64, chunk_size=16)
+        errors = []
+        validator(DummyUpload(io.BytesIO(self.PNG)), errors, None)
+        self.assertEqual(1, len(errors))
+
+    def test_pass_disk_file(self):
+        validator = File('field', hashes=('md5', 'sha1'), chunk_size=16)
+        stream = tempfile.TemporaryFile()
+        stream.write(self.PNG)
+        errors = []
+        upload = validator(DummyUpload(stream), errors, None)
+        stream.close()
+        self.assertEqual(0, len(errors))
+        self.assertEqual(self.PNG, upload.buffer[:])
+        self.assertEqual(hashlib.sha1(self.PNG).hexdigest(),
+                         upload.digests['sha1'])
+        upload.close()
+
+    def test_pass_small_chunks(self):
+        validator = File('field', chunk_size=3, content_types=('image/png',))
+        errors = []
+        upload = validator(DummyUpload(io.BytesIO(self.PNG)), errors, None)
+        self.assertEqual(0, len(errors))
+        self.assertEqual('image/png', upload.content_type)
+        upload.close()
+
+    def test_pass_empty(self):
+        validator = File('field')
+        errors = []
+        upload = validator(DummyUpload(io.BytesIO()), errors, None)
+        self.assertEqual(0, len(errors))
+        self.assertEqual(0, upload.size)
+        self.assertEqual('application/octet-stream', upload.content_type)
+
+    def test_pass_memory_file(self):
+        validator = File('field', max_size=len(self.PNG), chunk_size=16,
+                         content_types=('image/png',))
+        errors = []
+        upload = validator(DummyUpload(io.BytesIO(self.PNG)), errors, None)
+        self.assertEqual(0, len(errors))
+        self.assertEqual(('upload.png', len(self.PNG), 'image/png'),
+                         (upload.filename, upload.size, upload.content_type))
+        self.assertEqual(self.PNG, upload.buffer[:])
+        self.assertEqual(hashlib.sha256(self.PNG).hexdigest(),
+                         upload.digests['sha256'])
+        upload.close()
+
+
 class ListTest(unittest.TestCase):
     def test_fail_all(self):
         validator = List('field', String(None, min_length=2), min_elements=3)
@@ -196,6 +802,31 @@ class OrTest(unittest.TestCase):
         self.assertEqual('yes', validator('yes', errors, None))
         self.assertEqual(0, len(errors))
 
+    def test_accepted_types(self):
+        validator = Or('field', TextNumber(''), List('', String('')))
+        self.assertEqual(set([text_type, list]),
+                         set(validator.accepted_types))
+        self.assertEqual(None, Or('field', TextNumber(''),
+                                  Equals('', 1)).accepted_types)
+
+    def test_fail_type_reports_all(self):
+        validator = Or('field', TextNumber(''), List('', String('')))
+        errors = []
+        self.assertEqual(1, validator(1, errors, None))
+        self.assertEqual(1, len(errors))
+        self.assertTrue('must be a unicode string' in errors[0])
+        self.assertTrue('must be a list' in errors[0])
+
+    def test_skip_unacceptable_type(self):
+        text = TextNumber('')
+        text.run = None  # Fails if called
+        validator = Or('field', text, Equals('', 5))
+        errors = []
+        self.assertEqual(5, validator(5, errors, None))
+        self.assertEqual(0, len(errors))
+        self.assertEqual((validator.validators[1],),
+                         validator.candidates[int])
+
 
 class StringTests(unittest.TestCase):
     def test_fail_invalid_regex(self):
@@ -338,6 +969,46 @@ class WhiteSpaceStringTests(unittest.TestCase):
         validator(None, errors, None)
         self.assertEqual(1, len(errors))
 
+    def test_fail_linear_re(self):
+        validator = WhiteSpaceString('field', invalid_re='(a+)+$',
+                                     linear_re=True)
+        errors = []
+        validator('  aaa', errors, None)
+        self.assertEqual(1, len(errors))
+
+    def test_exponential_re_strict(self):
+        self.assertRaises(ValueError, WhiteSpaceString, 'field',
+                          invalid_re=r'(\w+\s?)*$', strict_re=True)
+        self.assertRaises(ValueError, WhiteSpaceString, 'field',
+                          invalid_re=re.compile('(a*)*b'), strict_re=True)
+
+    def test_exponential_re_warns(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            validator = WhiteSpaceString('field', invalid_re='(a*)*b')
+        self.assertEqual([RuntimeWarning], [x.category for x in caught])
+        errors = []
+        validator('aab', errors, None)
+        self.assertEqual(1, len(errors))
+
+    def test_linear_re_bounded(self):
+        validator = WhiteSpaceString('field', invalid_re='(a+)+$',
+                                     linear_re=True)
+        errors = []
+        validator('a' * 64 + '!', errors, None)
+        self.assertEqual(0, len(errors))
+
+    def test_linear_re_ignorecase(self):
+        validator = WhiteSpaceString('field', invalid_re='(?i)<script',
+                                     linear_re=True)
+        errors = []
+        validator('<\u017fcript>', errors, None)
+        self.assertEqual(1, len(errors))
+
+    def test_linear_re_unsupported(self):
+        self.assertRaises(ValueError, WhiteSpaceString, 'field',
+                          invalid_re=r'(a)\1', linear_re=True)
+
     def test_pass_all(self):
         validator = WhiteSpaceString('field', invalid_re='foo', min_length=5,
                                      max_length=5)
@@ -1,7 +1,23 @@
+import binascii
+import hashlib
+import logging
+import mmap
 import re
 import sys
+import tempfile
+import time
+import venusian
+import warnings
 from functools import wraps
-from .helpers import http_bad_request
+from operator import attrgetter
+from pyramid.httpexceptions import HTTPException, HTTPOk
+from pyramid.response import Response
+from .helpers import http_bad_request, http_ok, http_service_unavailable
+from .safe_re import LinearPattern, has_exponential_backtracking
+try:
+    import msgpack
+except ImportError:
+    msgpack = None  # pylint: disable=C0103
 
 # Inspired by reddit's validator code
 # https://github.com/reddit/reddit/blob/master/r2/r2/lib/validator/validator.py
@@ -9,61 +25,360 @@ from .helpers import http_bad_request
 # Configure text type
 if sys.version_info < (3, 0):
     text_type = unicode  # pylint: disable=C0103
+    JSON_TYPES = (bool, dict, float, int, list, long,  # NOQA
+                  type(None), unicode)  # NOQA
 else:
     text_type = str  # pylint: disable=C0103
+    JSON_TYPES = (bool, dict, float, int, list, type(None), str)
+
+clock = getattr(time, 'monotonic', time.time)  # pylint: disable=C0103
+log = logging.getLogger(__name__)  # pylint: disable=C0103
 
 
 # Validator Sources
 SOURCE_GET = 'GET'
 SOURCE_JSON_BODY = 'json_body'
 SOURCE_MATCHDICT = 'matchdict'
+SOURCE_MSGPACK_BODY = 'msgpack_body'
 SOURCE_POST = 'POST'
 
+SOURCES = {}
+
+
+def register_source(name, loader):
+    """Register the function used to load the parameters of source `name`.
+
+    :param name: The name validators refer to the source by.
+    :param loader: A function that is passed the request and returns a mapping
+        of the parameters. It is called at most once per request. Raising
+        AttributeError or ValueError indicates the source has no parameters.
+
+    Sources that are not registered are loaded from the request attribute of
+    the same name.
+
+    """
+    SOURCES[name] = loader
 
-def validate(**param_vals):
-    MISSING_ERROR = 'Missing {0} parameter: {1}'  # pylint: disable=C0103
 
+def load_msgpack_body(request):
+    """Return the request body decoded as MessagePack."""
+    return msgpack.unpackb(request.body, raw=False)
+
+
+def load_source(request, name):
+    """Return the parameters of source `name` for this request.
+
+    The loaded parameters are cached on the request so that each source is
+    only decoded once regardless of how many validators use it.
+
+    """
+    cache = getattr(request, '_validation_sources', None)
+    if cache is None:
+        cache = {}
+        request._validation_sources = cache  # pylint: disable=W0212
+    elif name in cache:
+        return cache[name]
+    loader = SOURCES.get(name) or attrgetter(name)
+    try:
+        data = loader(request)
+    except (AttributeError, ValueError):
+        data = {}
+    cache[name] = data
+    return data
+
+
+register_source(SOURCE_GET, attrgetter(SOURCE_GET))
+register_source(SOURCE_JSON_BODY, attrgetter(SOURCE_JSON_BODY))
+register_source(SOURCE_MATCHDICT, attrgetter(SOURCE_MATCHDICT))
+if msgpack is not None:
+    register_source(SOURCE_MSGPACK_BODY, load_msgpack_body)
+register_source(SOURCE_POST, attrgetter(SOURCE_POST))
+
+
+def includeme(config):
+    """Enable the registration of validated views found by `config.scan`.
+
+    Each view decorated by `validate` has its validators prepared when the
+    configuration is committed, rather than on its first request, and its
+    schema is available from the introspector under the
+    'validation schemas' category.
+
+    """
+    config.add_directive('register_validation', register_validation)
+
+
+def register_validation(config, view):
+    """Prepare the validators of `view` and register them for introspection.
+
+    This directive is called for each view decorated by `validate` when the
+    package containing it is scanned.
+
+    """
+    name = '{0}.{1}'.format(view.__module__, view.__name__)
+    intr = config.introspectable('validation schemas', view, name,
+                                 'validation schema')
+    intr['view'] = view
+    intr['schema'] = view.validators
+    intr['routes'] = []
+
+    def prepare():
+        start = time.time()
+        for validator in view.validators.values():
+            validator.prepare()
+        intr['setup_time'] = time.time() - start
+        # Find the routes the view is registered to
+        for view_intr in config.registry.introspector.get_category('views'):
+            callable_ = view_intr['introspectable']['callable']
+            while callable_ is not None and callable_ is not view:
+                callable_ = getattr(callable_, '__wrapped__', None)
+            route_name = view_intr['introspectable']['route_name']
+            if callable_ is view and route_name:
+                intr['routes'].append(route_name)
+        log.info('Prepared validation for %s (routes: %s) in %.3f ms', name,
+                 ', '.join(intr['routes']) or 'none',
+                 intr['setup_time'] * 1000)
+
+    # Run after the views have been added so that their routes are known
+    config.action(None, prepare, introspectables=(intr,), order=10)
+
+
+def scan_callback(scanner, _, obj):
+    """Register a view decorated by `validate` when it is scanned."""
+    config = getattr(scanner, 'config', None)
+    register = getattr(config, 'register_validation', None)
+    # Only when pyramid_addons is included, and not for the class when
+    # validate is used within a class body
+    if register and hasattr(obj, 'validators'):
+        register(obj)
+
+
+def validate_params(param_vals, request, sources=None):
+    """Return the validated parameters and the error messages.
+
+    :param param_vals: A dictionary mapping the parameter names to pass to
+        the view to their validators.
+    :param request: The pyramid request object.
+    :param sources: An optional dictionary mapping source names to their
+        parameters, used in place of loading them from the request.
+
+    ValidateAbort is raised when a validator aborts the validation, including
+    when the request's validation deadline has passed.
+
+    """
+    missing_error = 'Missing {0} parameter: {1}'
+    error_messages = []
+    validated_params = {}
+    for dst_param, validator in param_vals.items():
+        validator.check_deadline(request)
+        src_param = validator.param
+        # Select the correct source to find the parameter in
+        if sources and validator.source in sources:
+            data = sources[validator.source]
+        else:
+            data = load_source(request, validator.source)
+        # Look for the parameter
+        if src_param in data:
+            validator_errors = []
+            result = validator(data[src_param], validator_errors, request)
+            if validator_errors:
+                error_messages.extend(validator_errors)
+            else:
+                validated_params[dst_param] = result
+        elif validator.optional:
+            validated_params[dst_param] = validator.default
+        else:
+            error_messages.append(missing_error.format(validator.source,
+                                                       src_param))
+    return validated_params, error_messages
+
+
+def set_deadline(request, timeout):
+    """Set the time validation of `request` must complete by.
+
+    Return the previous deadline so that it can be restored.
+
+    """
+    previous = getattr(request, 'validation_deadline', None)
+    if timeout is not None:
+        request.validation_deadline = clock() + timeout
+    return previous
+
+
+def validate(_timeout=None, **param_vals):
+    """Validate the parameters of the decorated view.
+
+    :param _timeout: When provided, the number of seconds validation may take.
+        It is prefixed with an underscore so that it does not take a name
+        that a view's parameters may use.
+        Validators check the remaining time between steps, and once it is used
+        up the request is aborted with a 503 response.
+
+    """
     def initial_wrap(function):
         @wraps(function)
         def wrapped(request):
             # Validate each of the named parameters
-            error_messages = []
-            validated_params = {}
-            for dst_param, validator in param_vals.items():
-                src_param = validator.param
-                # Select the correct source to find the parameter in
-                try:
-                    data = getattr(request, validator.source)
-                except (AttributeError, ValueError):
-                    data = []
-                # Look for the parameter
-                if src_param in data:
-                    validator_errors = []
-                    try:
-                        result = validator(data[src_param], validator_errors,
-                                           request)
-                    except ValidateAbort as exc:
-                        # Return the desired abort response
-                        request.override_renderer = 'json'  # Hack for now
-                        return exc.response
-                    if validator_errors:
-                        error_messages.extend(validator_errors)
-                    else:
-                        validated_params[dst_param] = result
-                elif validator.optional:
-                    validated_params[dst_param] = validator.default
-                else:
-                    error_messages.append(MISSING_ERROR
-                                          .format(validator.source, src_param))
+            previous = set_deadline(request, _timeout)
+            try:
+                validated_params, error_messages = validate_params(param_vals,
+                                                                   request)
+            except ValidateAbort as exc:
+                # Return the desired abort response
+                request.override_renderer = 'json'  # Hack for now
+                return exc.response
+            finally:
+                if _timeout is not None:
+                    request.validation_deadline = previous
             if error_messages:
                 request.override_renderer = 'json'  # Hack for now
                 return http_bad_request(request, messages=error_messages)
             # pylint: disable=W0142
             return function(request, **validated_params)
+
+        wrapped.validators = param_vals
+        venusian.attach(wrapped, scan_callback, category='pyramid')
+        return wrapped
+    return initial_wrap
+
+
+def validate_batch(bulk=False, max_operations=None, _timeout=None,
+                   **param_vals):
+    """Validate a json body that is a list of operations.
+
+    Every operation is an object validated by the same validators, as if it
+    were the json body of a separate request. Parameters from other sources
+    are validated once and shared by all the operations.
+
+    :param bulk: When False, the view is called once per valid operation
+        with its parameters and the response contains a list with the status,
+        body and any headers each call resulted in. Invalid operations have a
+        400 status. When True, the view is called once with an `operations`
+        list of the parameters of every operation and its return value is
+        the response, unless any operation is invalid in which case a 400
+        response lists the errors of each operation.
+    :param max_operations: The maximum number of operations in a request.
+    :param _timeout: When provided, the number of seconds validation of all the
+        operations may take. The operations validated after it is used up
+        have a 503 status.
+
+    """
+    def initial_wrap(function):
+        @wraps(function)
+        def wrapped(request):
+            request.override_renderer = 'json'  # Hack for now
+            operations = load_source(request, SOURCE_JSON_BODY)
+            if not isinstance(operations, list):
+                return http_bad_request(
+                    request, messages=['Body must be a list of operations'])
+            if max_operations is not None and \
+                    len(operations) > max_operations:
+                return http_bad_request(request, messages=[
+                    'Body must contain <= {0} operations'
+                    .format(max_operations)])
+
+            previous = set_deadline(request, _timeout)
+            try:
+                valid, results = validate_operations(param_vals, request,
+                                                     operations)
+            finally:
+                if _timeout is not None:
+                    request.validation_deadline = previous
+
+            if bulk:
+                if None in valid:
+                    return http_bad_request(request, results=results)
+                return function(request, operations=valid)
+            for i, params in enumerate(valid):
+                if params is not None:
+                    num_headers = len(request.response.headerlist)
+                    try:
+                        # pylint: disable=W0142
+                        body = function(request, **params)
+                    except HTTPException as exc:
+                        body = exc
+                    results[i] = batch_result(request, body, num_headers)
+            return http_ok(request, results=results)
+
+        wrapped.validators = param_vals
+        venusian.attach(wrapped, scan_callback, category='pyramid')
         return wrapped
     return initial_wrap
 
 
+def validate_operations(param_vals, request, operations):
+    """Return the parameters and results of each operation of a batch.
+
+    The parameters of invalid operations are None, and the results of valid
+    operations are None as they are only known once the view is called.
+
+    The parameters found outside the json body are validated once and their
+    values, or errors, are shared by every operation.
+
+    """
+    shared_vals = {}
+    operation_vals = {}
+    for dst_param, validator in param_vals.items():
+        if validator.source == SOURCE_JSON_BODY:
+            operation_vals[dst_param] = validator
+        else:
+            shared_vals[dst_param] = validator
+    try:
+        shared_params, shared_errors = validate_params(shared_vals, request)
+        shared_abort = None
+    except ValidateAbort as exc:
+        shared_abort = exc.response
+
+    results = []
+    valid = []
+    for operation in operations:
+        if shared_abort is not None:
+            valid.append(None)
+            results.append(batch_result(request, shared_abort))
+            continue
+        if not isinstance(operation, dict):
+            valid.append(None)
+            results.append(batch_result(request, http_bad_request(
+                request, messages=['Operation must be an object'])))
+            continue
+        try:
+            params, error_messages = validate_params(
+                operation_vals, request, {SOURCE_JSON_BODY: operation})
+        except ValidateAbort as exc:
+            valid.append(None)
+            results.append(batch_result(request, exc.response))
+            continue
+        error_messages = shared_errors + error_messages
+        if error_messages:
+            valid.append(None)
+            results.append(batch_result(request, http_bad_request(
+                request, messages=error_messages)))
+        else:
+            params.update(shared_params)
+            valid.append(params)
+            results.append(None)
+    return valid, results
+
+
+def batch_result(request, body, num_headers=None):
+    """Return the result of a single operation of a batch request.
+
+    The response status, and any headers beyond the first `num_headers`, are
+    moved from the request's response into the result.
+
+    """
+    response = request.response
+    if isinstance(body, Response):
+        result = {'status': body.status_int, 'body': body.json_body
+                  if body.content_type == 'application/json' else None}
+    else:
+        result = {'status': response.status_int, 'body': body}
+    if num_headers is not None and len(response.headerlist) > num_headers:
+        result['headers'] = dict(response.headerlist[num_headers:])
+        del response.headerlist[num_headers:]
+    response.status = HTTPOk.code
+    return result
+
+
 class ValidateAbort(Exception):
 
     """An exception that when raised will end all further validation."""
@@ -73,10 +388,67 @@ class ValidateAbort(Exception):
         self.response = response
 
 
+class DepthExceeded(Exception):
+
+    """Raised within a Dict when its value is nested deeper than allowed."""
+
+    def __init__(self, owner):
+        super(DepthExceeded, self).__init__()
+        self.owner = owner  # The Dict whose max_depth is exceeded
+
+
+def check_depth(value, limit):
+    """Raise DepthExceeded if `value` is nested deeper than `limit` allows.
+
+    :param limit: A tuple of the number of levels of objects and lists
+        `value` may contain, including itself, and the Dict that set it.
+
+    """
+    levels, owner = limit
+    stack = [(value, 1)] if isinstance(value, (dict, list)) else []
+    while stack:
+        item, depth = stack.pop()
+        if depth > levels:
+            raise DepthExceeded(owner)
+        for child in item.values() if isinstance(item, dict) else item:
+            if isinstance(child, (dict, list)):
+                stack.append((child, depth + 1))
+
+
+class Upload(object):
+
+    """An uploaded file that has passed validation by a File validator."""
+
+    def __init__(self, filename, size, content_type, digests, buffer_):
+        """Create an Upload instance.
+
+        :param filename: The filename provided by the client.
+        :param size: The number of bytes in the file.
+        :param content_type: The content type determined from the content.
+        :param digests: A dictionary mapping hash names to hex digests.
+        :param buffer_: A read-only buffer, usually a memory map, of the file's
+            content.
+
+        """
+        self.filename = filename
+        self.size = size
+        self.content_type = content_type
+        self.digests = digests
+        self.buffer = buffer_
+
+    def close(self):
+        """Release the memory map of the file's content."""
+        if hasattr(self.buffer, 'close'):
+            self.buffer.close()
+
+
 class Validator(object):
 
     """An abstract validator class."""
 
+    # The types of values `run` can possibly accept, or None for any type.
+    # Subclasses that accept additional types must override this.
+    accepted_types = None
     default_source = SOURCE_JSON_BODY
 
     def __init__(self, param, optional=False, default=None, source=None):
@@ -88,10 +460,12 @@ class Validator(object):
             validation.
         :param default: The value to return when the parameter is optional and
             not provided.
-        :param source: The source that param should be found in. Valid options
-            are: SOURCE_MATCHDICT, SOURCE_GET, SOURCE_POST and
-            SOURCE_JSON_BODY. When None, use the class's `default_source`
-            selection.
+        :param source: The source that param should be found in. Built-in
+            options are: SOURCE_MATCHDICT, SOURCE_GET, SOURCE_POST,
+            SOURCE_JSON_BODY and SOURCE_MSGPACK_BODY, which requires msgpack to
+            be installed. Additional sources can be added via
+            `register_source`. When None, use the class's
+            `default_source` selection.
 
         """
         if not optional and default is not None:
@@ -101,6 +475,9 @@ class Validator(object):
         self.optional = optional
         self.default = default
         self.source = source if source is not None else self.default_source
+        if self.source == SOURCE_MSGPACK_BODY and msgpack is None:
+            raise ImportError('msgpack must be installed to use '
+                              'SOURCE_MSGPACK_BODY')
 
     def __call__(self, value, *args):
         return self.run(value, *args)
@@ -109,6 +486,41 @@ class Validator(object):
         errors.append('Validation error on param \'{0}\': {1}'
                       .format(self.param, message))
 
+    def check_deadline(self, request):
+        """Raise ValidateAbort if the request's validation deadline passed.
+
+        Validators that loop over many items, or perform I/O, should call this
+        between items and before the I/O.
+
+        """
+        deadline = getattr(request, 'validation_deadline', None)
+        if deadline is not None and clock() > deadline:
+            raise ValidateAbort(http_service_unavailable(
+                request, messages=['Validation of param \'{0}\' exceeded the '
+                                   'time limit'.format(self.param)]))
+
+    def prepare(self):
+        """Precompute anything that would otherwise be done lazily.
+
+        Validators that compose other validators must prepare them too.
+
+        """
+        pass
+
+    def run_nested(self, value, errors, request, limit):
+        """Perform the validation of a value within an object or list.
+
+        :param limit: None, or the tuple passed to `check_depth` that limits
+            how deeply `value` may be nested.
+
+        Validators that descend into objects or lists override this to check
+        the depth as they go, while the value of others is scanned first.
+
+        """
+        if limit is not None:
+            check_depth(value, limit)
+        return self(value, errors, request)
+
     def run(self, value, errors, request):
         """Perform the validation using the validator.
 
@@ -133,6 +545,12 @@ class And(Validator):
     def __init__(self, param, *validators, **kwargs):
         super(And, self).__init__(param, **kwargs)
         self.validators = validators
+        if validators:
+            self.accepted_types = validators[0].accepted_types
+
+    def prepare(self):
+        for validator in self.validators:
+            validator.prepare()
 
     def run(self, value, errors, request):
         for validator in self.validators:
@@ -146,6 +564,168 @@ class And(Validator):
         return value
 
 
+class Binary(Validator):
+
+    """A validator for base64 encoded text that returns the decoded bytes.
+
+    The decoded length is checked from the encoded length before decoding, and
+    the bytes are returned as a memoryview so that views can slice them
+    without copying.
+
+    """
+
+    accepted_types = (text_type,)
+    BASE64_RE = re.compile('[A-Za-z0-9+/]*={0,2}\\Z')
+    URLSAFE_BASE64_RE = re.compile('[A-Za-z0-9_-]*={0,2}\\Z')
+    URLSAFE_TABLE = dict((ord(x), ord(y)) for x, y in (('-', '+'), ('_', '/')))
+
+    def __init__(self, param, min_length=None, max_length=None, urlsafe=False,
+                 **kwargs):
+        """Create a Binary instance.
+
+        :param min_length: The minimum number of decoded bytes.
+        :param max_length: The maximum number of decoded bytes.
+        :param urlsafe: When True, expect the URL and filename safe alphabet
+            that uses `-` and `_` in place of `+` and `/`.
+
+        """
+        super(Binary, self).__init__(param, **kwargs)
+        self.min_length = min_length
+        self.max_length = max_length
+        self.urlsafe = urlsafe
+        self.alphabet_re = self.URLSAFE_BASE64_RE if urlsafe \
+            else self.BASE64_RE
+
+    def run(self, value, errors, _):
+        if not isinstance(value, text_type):
+            self.add_error(errors, 'must be a unicode string')
+            return value
+
+        encoded_length = len(value)
+        if encoded_length % 4:
+            self.add_error(errors, 'must be base64 encoded')
+            return value
+        length = encoded_length // 4 * 3
+        if value.endswith('=='):
+            length -= 2
+        elif value.endswith('='):
+            length -= 1
+        if self.min_length is not None and length < self.min_length:
+            self.add_error(errors, 'must be >= {0} bytes'
+                           .format(self.min_length))
+            return value
+        elif self.max_length is not None and length > self.max_length:
+            self.add_error(errors, 'must be <= {0} bytes'
+                           .format(self.max_length))
+            return value
+
+        if not self.alphabet_re.match(value):
+            self.add_error(errors, 'must be base64 encoded')
+            return value
+        if self.urlsafe:
+            value = value.translate(self.URLSAFE_TABLE)
+        return memoryview(binascii.a2b_base64(value))
+
+
+class Dict(Validator):
+
+    """A validator that validates the values of an object by key.
+
+    Each validator's `param` is the key it validates. Keys without a
+    validator are rejected, keys of non-optional validators are required and
+    missing optional keys are set to their validator's default.
+
+    """
+
+    accepted_types = (dict,)
+
+    def __init__(self, param, *validators, **kwargs):
+        """Create a Dict instance.
+
+        :param max_keys: When provided, the maximum number of keys the object
+            may contain.
+        :param max_depth: When provided, the maximum number of levels of
+            objects and lists the value may contain, including itself.
+
+        """
+        self.max_keys = kwargs.pop('max_keys', None)
+        self.max_depth = kwargs.pop('max_depth', None)
+        super(Dict, self).__init__(param, **kwargs)
+        self.validators = {}
+        for validator in validators:
+            if validator.param in self.validators:
+                raise TypeError('Duplicate key: {0}'.format(validator.param))
+            self.validators[validator.param] = validator
+        self.required = [x.param for x in validators if not x.optional]
+        self.optional_validators = [x for x in validators if x.optional]
+
+    def prepare(self):
+        for validator in self.validators.values():
+            validator.prepare()
+
+    def run(self, value, errors, request):
+        return self.run_nested(value, errors, request, None)
+
+    def run_nested(self, value, errors, request, limit):
+        if not isinstance(value, dict):
+            self.add_error(errors, 'must be an object')
+            return value
+        if limit is not None and limit[0] < 1:
+            raise DepthExceeded(limit[1])
+        if self.max_keys is not None and len(value) > self.max_keys:
+            self.add_error(errors, 'must contain <= {0} keys'
+                           .format(self.max_keys))
+            return value
+        if self.max_depth is not None and \
+                (limit is None or self.max_depth <= limit[0]):
+            limit = (self.max_depth, self)
+        these_errors = []
+        try:
+            result = self.validate_keys(value, these_errors, request,
+                                        limit and (limit[0] - 1, limit[1]))
+        except DepthExceeded as exc:
+            if exc.owner is not self:
+                raise
+            self.add_error(errors, 'must be nested <= {0} levels'
+                           .format(self.max_depth))
+            return value
+        errors.extend(these_errors)
+        return result
+
+    def validate_keys(self, value, errors, request, limit):
+        """Return the validated values of the object `value`.
+
+        Its values are checked against `limit` as they are validated so that
+        each is only visited once.
+
+        """
+        result = {}
+        required = 0
+        for key, item in value.items():
+            self.check_deadline(request)
+            validator = self.validators.get(key)
+            if validator is None:
+                self.add_error(errors, 'unknown key \'{0}\''.format(key))
+                continue
+            if not validator.optional:
+                required += 1
+            these_errors = []
+            item = validator.run_nested(item, these_errors, request, limit)
+            if these_errors:
+                for error in these_errors:
+                    self.add_error(errors, error)
+            else:
+                result[key] = item
+        if required < len(self.required):
+            for key in self.required:
+                if key not in value:
+                    self.add_error(errors, 'missing key \'{0}\''.format(key))
+        for validator in self.optional_validators:
+            if validator.param not in value:
+                result[validator.param] = validator.default
+        return result
+
+
 class Enum(Validator):
 
     """Validator that verifies the value is one of a few options."""
@@ -158,6 +738,9 @@ class Enum(Validator):
         # pylint: disable=W0142
         self.validator = Or(param, *[Equals('', x) for x in values])
 
+    def prepare(self):
+        self.validator.prepare()
+
     def run(self, value, errors, request):
         return self.validator(value, errors, request)
 
@@ -176,8 +759,113 @@ class Equals(Validator):
         return value
 
 
+class File(Validator):
+
+    """A validator for uploaded files that reads them in bounded memory.
+
+    The upload is read in chunks, which are hashed as they are read, and the
+    view is passed an `Upload` whose `buffer` memory maps the file's content.
+
+    """
+
+    default_source = SOURCE_POST
+    # Leading bytes used to determine the content type of the file
+    SIGNATURES = ((b'\x89PNG\r\n\x1a\n', 'image/png'),
+                  (b'\xff\xd8\xff', 'image/jpeg'),
+                  (b'GIF87a', 'image/gif'),
+                  (b'GIF89a', 'image/gif'),
+                  (b'%PDF-', 'application/pdf'),
+                  (b'PK\x03\x04', 'application/zip'),
+                  (b'\x1f\x8b', 'application/gzip'))
+    SNIFF_LENGTH = max(len(x) for x, _ in SIGNATURES)
+    UNKNOWN_TYPE = 'application/octet-stream'
+
+    def __init__(self, param, max_size=None, content_types=None,
+                 hashes=('sha256',), chunk_size=65536, **kwargs):
+        """Create a File instance.
+
+        :param max_size: The maximum number of bytes the file may contain.
+        :param content_types: When provided, the content types, as determined
+            from the file's leading bytes, that are accepted.
+        :param hashes: The names of the hashlib algorithms to compute digests
+            of the file's content with.
+        :param chunk_size: The number of bytes to read at a time.
+
+        """
+        super(File, self).__init__(param, **kwargs)
+        self.max_size = max_size
+        self.content_types = content_types
+        self.hashes = hashes
+        self.chunk_size = chunk_size
+
+    def sniff(self, data):
+        """Return the content type indicated by the leading bytes `data`."""
+        for signature, content_type in self.SIGNATURES:
+            if data.startswith(signature):
+                return content_type
+        return self.UNKNOWN_TYPE
+
+    def run(self, value, errors, _):
+        stream = getattr(value, 'file', None)
+        if stream is None:
+            self.add_error(errors, 'must be a file')
+            return value
+        # Files already on disk are mapped directly, otherwise the content is
+        # spooled to a temporary file while it is read
+        try:
+            stream.fileno()
+            spool = None
+        except (AttributeError, IOError, ValueError):
+            spool = tempfile.TemporaryFile()
+        if hasattr(stream, 'seek'):
+            stream.seek(0)
+        digests = [(x, hashlib.new(x)) for x in self.hashes]
+        content_type = None
+        leading = b''  # Buffered until long enough to contain any signature
+        size = 0
+        while True:
+            chunk = stream.read(self.chunk_size)
+            if not chunk:
+                break
+            if content_type is None:
+                leading += chunk[:self.SNIFF_LENGTH - len(leading)]
+                if len(leading) == self.SNIFF_LENGTH:
+                    content_type = self.sniff(leading)
+            size += len(chunk)
+            if self.max_size is not None and size > self.max_size:
+                self.add_error(errors, 'must be <= {0} bytes'
+                               .format(self.max_size))
+                if spool:
+                    spool.close()
+                return value
+            for _, digest in digests:
+                digest.update(chunk)
+            if spool:
+                spool.write(chunk)
+        content_type = content_type or self.sniff(leading)
+        if self.content_types and content_type not in self.content_types:
+            self.add_error(errors, 'must not be of type {0}'
+                           .format(content_type))
+            if spool:
+                spool.close()
+            return value
+
+        source = spool or stream
+        source.flush()
+        if size:
+            buffer_ = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buffer_ = memoryview(b'')
+        if spool:
+            spool.close()  # The memory map remains valid
+        return Upload(getattr(value, 'filename', None), size, content_type,
+                      dict((x, y.hexdigest()) for x, y in digests), buffer_)
+
+
 class List(Validator):
     """A validator that validates items within a list."""
+    accepted_types = (list,)
+
     def __init__(self, param, validator, min_elements=None, max_elements=None,
                  **kwargs):
         super(List, self).__init__(param, **kwargs)
@@ -185,53 +873,108 @@ class List(Validator):
         self.min_elements = min_elements
         self.max_elements = max_elements
 
+    def prepare(self):
+        self.validator.prepare()
+
     def run(self, value, errors, request):
+        return self.run_nested(value, errors, request, None)
+
+    def run_nested(self, value, errors, request, limit):
         if not isinstance(value, list):
             self.add_error(errors, 'must be a list')
             return value
+        if limit is not None and limit[0] < 1:
+            raise DepthExceeded(limit[1])
         msg = 'must contain {0}= {1} elements'
         if self.min_elements is not None and len(value) < self.min_elements:
             self.add_error(errors, msg.format('>', self.min_elements))
         elif self.max_elements is not None and len(value) > self.max_elements:
             self.add_error(errors, msg.format('<', self.max_elements))
+        limit = limit and (limit[0] - 1, limit[1])
+        # Build a new list as the value may be shared with other validators
+        result = []
         for i, item in enumerate(value):
+            self.check_deadline(request)
             self.validator.param = (self.param, i)
-            value[i] = self.validator(item, errors, request)
-        return value
+            result.append(self.validator.run_nested(item, errors, request,
+                                                    limit))
+        return result
 
 
 class Or(Validator):
     """Composes multiple validators with disjunction. An empty
-    Or returns with an error."""
+    Or returns with an error.
+
+    Only the validators that accept the type of the value are tried. The
+    remaining validators are only run to report their errors when all the
+    candidates fail.
+
+    """
 
     def __init__(self, param, *validators, **kwargs):
         super(Or, self).__init__(param, **kwargs)
         self.validators = validators
+        self.candidates = {}  # Maps a value's type to the possible validators
+        accepted = set()
+        for validator in validators:
+            if validator.accepted_types is None:
+                break
+            accepted.update(validator.accepted_types)
+        else:
+            self.accepted_types = tuple(accepted)
+
+    def candidates_for(self, value_type):
+        """Return the validators that can accept values of `value_type`."""
+        try:
+            return self.candidates[value_type]
+        except KeyError:
+            candidates = tuple(
+                x for x in self.validators if x.accepted_types is None or
+                issubclass(value_type, x.accepted_types))
+            self.candidates[value_type] = candidates
+            return candidates
+
+    def prepare(self):
+        for validator in self.validators:
+            validator.prepare()
+        for value_type in JSON_TYPES:
+            self.candidates_for(value_type)
 
     def run(self, value, errors, request):
         if not self.validators:
             self.add_error(errors, 'empty disjunction')
             return value
 
-        all_errors = []
-        for validator in self.validators:
+        candidates = self.candidates_for(type(value))
+        all_errors = {}
+        for validator in candidates:
             these_errors = []
             validator.param = self.param
             new_value = validator(value, these_errors, request)
             if not these_errors:
                 return new_value
-            all_errors.append(these_errors)
+            all_errors[validator] = these_errors
+
+        error_groups = []
+        for validator in self.validators:
+            these_errors = all_errors.get(validator)
+            if these_errors is None:
+                these_errors = []
+                validator.param = self.param
+                new_value = validator(value, these_errors, request)
+                if not these_errors:
+                    return new_value
+            error_groups.append('({0})'.format(', '.join(these_errors)))
 
         msg = 'disjunction of evaluators failed: !({0})'
-        error_groups = ['({0})'.format(', '.join(error_group))
-                        for error_group in all_errors]
-        self.add_error(errors,
-                       msg.format(' || '.join(error_groups)))
+        self.add_error(errors, msg.format(' || '.join(error_groups)))
         return value
 
 
 class TextNumber(Validator):
     """A validator that accepts only text that represents integers."""
+    accepted_types = (text_type,)
+
     def __init__(self, param, min_value=None, max_value=None, **kwargs):
         super(TextNumber, self).__init__(param, **kwargs)
         self.min_value = min_value
@@ -257,12 +1000,37 @@ class TextNumber(Validator):
 
 class WhiteSpaceString(Validator):
     """A validator for a generic string that allows whitespace on both ends."""
+    accepted_types = (text_type,)
+
     def __init__(self, param, invalid_re=None, min_length=0, max_length=None,
-                 trim_whitespace=False, lowercase=False, **kwargs):
+                 trim_whitespace=False, lowercase=False, linear_re=False,
+                 strict_re=False, **kwargs):
+        """Create a WhiteSpaceString instance.
+
+        :param invalid_re: A pattern string or compiled regular expression
+            that the value must not contain. A RuntimeWarning is issued for
+            patterns that may backtrack exponentially unless `linear_re` is
+            True.
+        :param linear_re: When True, search for `invalid_re` in time linear to
+            the length of the value, rather than with the `re` module.
+        :param strict_re: When True, raise a ValueError rather than warn about
+            patterns that may backtrack exponentially.
+
+        """
         super(WhiteSpaceString, self).__init__(param, **kwargs)
         self.min_length = min_length
         self.max_length = max_length
-        if invalid_re and not hasattr(invalid_re, 'match'):
+        if invalid_re and not linear_re and \
+                has_exponential_backtracking(invalid_re):
+            msg = ('invalid_re {0!r} may backtrack exponentially. Fix the '
+                   'pattern or set linear_re=True.'
+                   .format(getattr(invalid_re, 'pattern', invalid_re)))
+            if strict_re:
+                raise ValueError(msg)
+            warnings.warn(msg, RuntimeWarning)
+        if invalid_re and linear_re:
+            self.invalid_re = LinearPattern(invalid_re)
+        elif invalid_re and not hasattr(invalid_re, 'match'):
             self.invalid_re = re.compile(invalid_re)
         else:
             self.invalid_re = invalid_re
@@ -1,12 +1,278 @@
 #!/usr/bin/env python
-import example
+"""Run the example application.
+
+By default a single-threaded server is started. Pass `--workers` to pre-fork
+that many worker processes which share the listening socket and each handle
+requests from a pool of `--threads` threads. Sending SIGHUP to the master
+process gracefully replaces the workers, reloading the application code, and
+SIGTERM or SIGINT gracefully stops them. The old workers keep serving until
+every new worker has started, and remain when the reloaded code fails to
+start.
+
+"""
+import os
+import select
+import signal
 import sys
-from wsgiref.simple_server import make_server
+import threading
+import time
+from optparse import OptionParser
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue  # NOQA
+
+HOST = '127.0.0.1'
+PORT = 8080
+
+
+class QuietHandler(WSGIRequestHandler):
+
+    """A request handler that does not log each request."""
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadPoolWSGIServer(WSGIServer):
+
+    """A WSGIServer that hands accepted connections to a pool of threads."""
+
+    def __init__(self, sock, app, threads, handler_class):
+        WSGIServer.__init__(self, sock.getsockname()[:2], handler_class,
+                            bind_and_activate=False)
+        self.socket.close()
+        self.socket = sock
+        self.server_bind_done()
+        self.set_app(app)
+        self.requests = Queue()
+        self.pool = [threading.Thread(target=self.process_queue)
+                     for _ in range(threads)]
+        for thread in self.pool:
+            thread.daemon = True
+            thread.start()
+
+    def server_bind_done(self):
+        """Set the attributes `server_bind` would have set on the socket."""
+        host, port = self.socket.getsockname()[:2]
+        self.server_name = host
+        self.server_port = port
+        self.setup_environ()
+
+    def process_queue(self):
+        """Handle queued connections until a None sentinel is received."""
+        while True:
+            item = self.requests.get()
+            if item is None:
+                self.requests.task_done()
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:  # pylint: disable=W0703
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                self.requests.task_done()
+
+    def process_request(self, request, client_address):
+        self.requests.put((request, client_address))
+
+    def drain(self):
+        """Wait for all queued connections to complete and stop the pool."""
+        for _ in self.pool:
+            self.requests.put(None)
+        self.requests.join()
+
+
+def build_worker(sock, threads, handler_class):
+    """Return the server a worker process serves requests with."""
+    import example  # Imported here so that each generation reloads the code
+    return ThreadPoolWSGIServer(sock, example.main(), threads, handler_class)
+
+
+def run_worker(server):
+    """Serve requests with `server` until SIGTERM is received."""
+    def stop(*_):
+        # shutdown blocks until serve_forever returns so it cannot be called
+        # from the thread that is running serve_forever
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    server.serve_forever()
+    server.drain()
+
+
+def spawn_worker(sock, threads, handler_class):
+    """Fork a worker process and return its pid and its readiness pipe.
+
+    The worker writes a byte to the pipe once it has started the application.
+    Reaching the end of the pipe without a byte means it failed to start.
+
+    """
+    ready_read, ready_write = os.pipe()
+    pid = os.fork()
+    if pid:
+        os.close(ready_write)
+        return pid, ready_read
+    os.close(ready_read)
+    status = 0
+    try:
+        server = build_worker(sock, threads, handler_class)
+        os.write(ready_write, b'1')
+        os.close(ready_write)
+        run_worker(server)
+    except Exception:  # pylint: disable=W0703
+        import traceback
+        traceback.print_exc()
+        status = 1
+    finally:
+        os._exit(status)  # pylint: disable=W0212
+
+
+def run_master(options, handler_class):
+    """Pre-fork and supervise the worker processes."""
+    listener = make_server(HOST, options.port, None)
+    sock = listener.socket
+    print('http://{0}:{1} (master pid {2}, {3} workers x {4} threads)'
+          .format(HOST, options.port, os.getpid(), options.workers,
+                  options.threads))
+    state = {'reload': False, 'retval': 0, 'started': False, 'stop': False}
+    workers = set()  # Workers serving requests
+    booting = {}  # Maps the pids of starting workers to their readiness pipe
+    booted = set()  # Workers that started since booting was last empty
+    replacing = set()  # Workers to retire once the new generation started
+    retiring = set()
+
+    def request_reload(*_):
+        state['reload'] = True
+
+    def request_stop(*_):
+        state['stop'] = True
+
+    def spawn():
+        pid, pipe = spawn_worker(sock, options.threads, handler_class)
+        booting[pid] = pipe
+
+    def retire(pids):
+        for pid in pids:
+            os.kill(pid, signal.SIGTERM)
+        retiring.update(pids)
+
+    def abandon_booting():
+        for pipe in booting.values():
+            os.close(pipe)
+        retire(booted | set(booting))
+        booting.clear()
+        booted.clear()
+        replacing.clear()
+
+    def check_boot(pid, exited):
+        """Handle the readiness report of a starting worker."""
+        pipe = booting.pop(pid)
+        ready = os.read(pipe, 1)
+        os.close(pipe)
+        if ready and not exited:
+            booted.add(pid)
+            return
+        elif ready:  # Started and then exited so replace it
+            spawn()
+            return
+        elif not exited:
+            os.waitpid(pid, 0)
+        if not state['started']:
+            print('Worker {0} failed to start the application. Stopping.'
+                  .format(pid))
+            state['stop'] = True
+            state['retval'] = 1
+        else:
+            print('Worker {0} failed to start the application. Keeping the {1}'
+                  ' running workers.'.format(pid, len(workers)))
+            abandon_booting()
+
+    signal.signal(signal.SIGHUP, request_reload)
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    for _ in range(options.workers):
+        spawn()
+    while workers or booting or booted or retiring:
+        if state['stop']:
+            state['stop'] = False
+            retire(workers)
+            workers.clear()
+            abandon_booting()
+        elif state['reload'] and not booting:
+            # Start the new generation and only retire the old one once every
+            # new worker has started so that the socket is always served
+            state['reload'] = False
+            replacing.update(workers)
+            for _ in range(options.workers):
+                spawn()
+
+        if booting:
+            try:
+                readable = select.select(list(booting.values()), [], [],
+                                         0.1)[0]
+            except select.error:  # Interrupted by a signal
+                readable = []
+            for pid, pipe in list(booting.items()):
+                if pipe in readable and pid in booting:
+                    check_boot(pid, False)
+        else:
+            time.sleep(0.1)
+        if not booting and booted:
+            state['started'] = True
+            retire(replacing)
+            workers.difference_update(replacing)
+            workers.update(booted)
+            booted.clear()
+            replacing.clear()
+
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except OSError:  # No remaining children
+            break
+        if pid in retiring:
+            retiring.remove(pid)
+        elif pid in booting:  # Exited before its report was read
+            check_boot(pid, True)
+        elif pid in workers or pid in booted:  # Unexpected exit so replace it
+            workers.discard(pid)
+            booted.discard(pid)
+            time.sleep(1)
+            spawn()
+    sock.close()
+    return state['retval']
 
 
 def main():
-    server = make_server('127.0.0.1', 8080, example.main())
-    print('http://127.0.0.1:8080')
+    parser = OptionParser(usage='Usage: %prog [options]')
+    parser.add_option('-p', '--port', type='int', default=PORT,
+                      help='The port to listen on (default: %default)')
+    parser.add_option('-w', '--workers', type='int', default=0,
+                      help='Number of worker processes to pre-fork. When 0, '
+                      'serve from a single thread (default: %default)')
+    parser.add_option('-t', '--threads', type='int', default=8,
+                      help='Number of threads per worker (default: %default)')
+    parser.add_option('-q', '--quiet', action='store_true',
+                      help='Do not log each request')
+    options, args = parser.parse_args()
+    if args or options.workers < 0 or options.threads < 1:
+        parser.print_usage()
+        return 1
+    handler_class = QuietHandler if options.quiet else WSGIRequestHandler
+
+    if options.workers:
+        return run_master(options, handler_class)
+
+    import example
+    server = make_server(HOST, options.port, example.main(),
+                         handler_class=handler_class)
+    print('http://{0}:{1}'.format(HOST, options.port))
     server.serve_forever()
 
 